@@ -1,169 +1,342 @@
 # Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
 # SPDX-License-Identifier: MIT-0
 
+import base64
 import boto3
 import os
 import json
 import logging
-import uuid
+import secrets
 import sys
-from datetime import datetime
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from botocore.config import Config
 from aws_xray_sdk.core import xray_recorder
-from aws_xray_sdk.core import patch_all
 
-# Patch AWS services for X-Ray tracing
-patch_all()
+# Prefer orjson for the request path, fall back to the stdlib encoder when it
+# is not packaged with the function
+try:
+    import orjson
+
+    def json_dumps(obj):
+        return orjson.dumps(obj).decode()
+
+    json_loads = orjson.loads
+except ImportError:
+    json_dumps = json.dumps
+    json_loads = json.loads
+
+# AWS SDK calls are traced with explicit subsegments around the DynamoDB writes
+# instead of patch_all(), which wraps every botocore call on the request path
 
 # Configure structured logging for security events
 logger = logging.getLogger()
-logger.setLevel(logging.INFO)
 
-# Create formatter for structured JSON logs
-formatter = logging.Formatter(
-    '{"timestamp": "%(asctime)s", "level": "%(levelname)s", "message": "%(message)s", "function": "%(funcName)s"}'
+
+class JsonFieldsFormatter(logging.Formatter):
+    # Structured fields are passed as extra={"fields": {...}} and only serialized
+    # here, for records that actually get emitted
+    def format(self, record):
+        fields = getattr(record, "fields", None)
+        entry = {
+            "timestamp": self.formatTime(record),
+            "level": record.levelname,
+            "message": fields if fields is not None else record.getMessage(),
+            "function": record.funcName,
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        if record.stack_info:
+            entry["stack_info"] = self.formatStack(record.stack_info)
+        return json_dumps(entry)
+
+
+def configure_logging():
+    # The root logger outlives this module, so only install the handlers once
+    if getattr(logger, "_structured_logging_configured", False):
+        return
+    logger.setLevel(logging.INFO)
+
+    # Create formatter for structured JSON logs
+    formatter = JsonFieldsFormatter()
+
+    # Configure handler - records are written synchronously so every audit log
+    # is flushed before Lambda freezes the sandbox
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(formatter)
+    logger.handlers = [stream_handler]
+    logger._structured_logging_configured = True
+
+
+configure_logging()
+
+# Keep connections to DynamoDB alive so warm invocations reuse the TLS session
+dynamodb_client = boto3.client(
+    "dynamodb",
+    config=Config(
+        max_pool_connections=50,
+        retries={"max_attempts": 3, "mode": "adaptive"},
+        tcp_keepalive=True,
+    ),
 )
+TABLE_NAME = os.environ["TABLE_NAME"]
+# Per-step audit logs (processing start, write success) are only emitted when enabled
+VERBOSE_AUDIT = os.environ.get("VERBOSE_AUDIT", "0") == "1"
+
+# Resolved from the context on the first invocation and reused afterwards
+_FUNCTION_NAME = None
+
+# BatchWriteItem accepts at most 25 put requests per call
+BATCH_WRITE_MAX_ITEMS = 25
+BATCH_WRITE_MAX_RETRIES = 5
+BATCH_WRITE_BASE_BACKOFF_SECONDS = 0.1
+
+# boto3 clients are thread safe, the workers share dynamodb_client and its connection pool
+BATCH_WRITE_MAX_WORKERS = 8
+batch_write_executor = ThreadPoolExecutor(max_workers=BATCH_WRITE_MAX_WORKERS)
+
+SUCCESS_BODY = json_dumps({"message": "Successfully inserted data!"})
+INVALID_LIST_BODY = json_dumps({"message": "Expected a non-empty list of item objects"})
+
+# Static attributes of the item written when the request has no payload
+DEFAULT_ITEM_BASE = {
+    "year": {"N": "2012"},
+    "title": {"S": "The Amazing Spider-Man 2"},
+}
+
+
+def as_str(value):
+    # DynamoDB attribute values must be strings, JSON decoding already returns most of them as str
+    return value if isinstance(value, str) else str(value)
+
+
+def to_item(item):
+    return {
+        "year": {"N": as_str(item["year"])},
+        "title": {"S": as_str(item["title"])},
+        "id": {"S": as_str(item["id"])},
+    }
+
+
+def to_put_request(item):
+    return {"PutRequest": {"Item": to_item(item)}}
+
 
-# Configure handler
-handler = logging.StreamHandler(sys.stdout)
-handler.setFormatter(formatter)
-logger.handlers = [handler]
+def write_batch(table, request_items):
+    # Retry unprocessed items with exponential backoff
+    attempt = 0
+    while request_items:
+        response = dynamodb_client.batch_write_item(RequestItems=request_items)
+        request_items = response.get("UnprocessedItems")
+        if not request_items:
+            break
+        if attempt >= BATCH_WRITE_MAX_RETRIES:
+            raise RuntimeError(
+                f"Unable to write {len(request_items[table])} items to {table} after {attempt} retries"
+            )
+        time.sleep(BATCH_WRITE_BASE_BACKOFF_SECONDS * (2 ** attempt))
+        attempt += 1
 
-dynamodb_client = boto3.client("dynamodb")
+
+def batch_write_items(table, items):
+    # Write items in slices of 25, sending the slices concurrently over the shared client
+    batches = [
+        {table: [to_put_request(item) for item in items[start:start + BATCH_WRITE_MAX_ITEMS]]}
+        for start in range(0, len(items), BATCH_WRITE_MAX_ITEMS)
+    ]
+    if not batches:
+        return
+    with xray_recorder.in_subsegment('ddb_batch_write_item'):
+        if len(batches) == 1:
+            write_batch(table, batches[0])
+            return
+        # list() waits for every batch and re-raises the first failure
+        list(batch_write_executor.map(lambda batch: write_batch(table, batch), batches))
 
 
 @xray_recorder.capture('lambda_handler')
 def handler(event, context):
-    table = os.environ.get("TABLE_NAME")
-    
+    global _FUNCTION_NAME
+    if _FUNCTION_NAME is None:
+        _FUNCTION_NAME = context.function_name
+
+    # Skip building log and trace payloads that would be discarded
+    info_on = logger.isEnabledFor(logging.INFO)
+    verbose_on = info_on and VERBOSE_AUDIT
+    sampled = xray_recorder.is_sampled()
+
+    # One timestamp per request is enough to correlate its log lines
+    timestamp = datetime.now(timezone.utc).isoformat()
+
     # Extract security-relevant information from event
+    # HTTP API (payload format 2.0) puts the caller details under requestContext.http
     request_context = event.get("requestContext", {})
-    identity = request_context.get("identity", {})
-    source_ip = identity.get("sourceIp", "unknown")
-    user_agent = identity.get("userAgent", "unknown")
+    http = request_context.get("http", {})
+    source_ip = http.get("sourceIp", "unknown")
+    user_agent = http.get("userAgent", "unknown")
     
     # Log security event - API request received
-    logger.info(json.dumps({
-        "event_type": "api_request_received",
-        "source_ip": source_ip,
-        "user_agent": user_agent,
-        "request_id": context.aws_request_id,
-        "function_name": context.function_name,
-        "table_name": table,
-        "timestamp": datetime.utcnow().isoformat()
-    }))
+    if info_on:
+        logger.info("api_request_received", extra={"fields": {
+            "event_type": "api_request_received",
+            "source_ip": source_ip,
+            "user_agent": user_agent,
+            "request_id": context.aws_request_id,
+            "function_name": _FUNCTION_NAME,
+            "table_name": TABLE_NAME,
+            "timestamp": timestamp,
+        }})
     
     # Add custom annotation for X-Ray filtering
-    xray_recorder.put_annotation("table_name", table)
-    xray_recorder.put_annotation("source_ip", source_ip)
-    xray_recorder.put_metadata("security_context", {
-        "function_name": context.function_name,
-        "request_id": context.aws_request_id,
-        "source_ip": source_ip,
-        "user_agent": user_agent
-    })
+    if sampled:
+        xray_recorder.put_annotation("table_name", TABLE_NAME)
+        xray_recorder.put_annotation("source_ip", source_ip)
+        xray_recorder.put_metadata("security_context", {
+            "function_name": _FUNCTION_NAME,
+            "request_id": context.aws_request_id,
+            "source_ip": source_ip,
+            "user_agent": user_agent
+        })
     
     try:
-        if event["body"]:
-            with xray_recorder.in_subsegment('process_request_with_payload'):
-                item = json.loads(event["body"])
-                
-                # Log data access event
-                logger.info(json.dumps({
+        body = event.get("body")
+        if body and event.get("isBase64Encoded"):
+            body = base64.b64decode(body)
+        if body:
+            item = json_loads(body)
+            
+            # Log data access event
+            if verbose_on:
+                logger.info("data_processing_start", extra={"fields": {
                     "event_type": "data_processing_start",
                     "has_payload": True,
                     "request_id": context.aws_request_id,
                     "source_ip": source_ip,
-                    "timestamp": datetime.utcnow().isoformat()
-                }))
-                
-                year = str(item["year"])
-                title = str(item["title"])
-                id = str(item["id"])
-                
+                    "timestamp": timestamp,
+                }})
+            
+            if isinstance(item, list):
+                # Reject an empty list or one holding anything but item objects
+                if not item or not all(isinstance(entry, dict) for entry in item):
+                    logger.warning("api_request_rejected", extra={"fields": {
+                        "event_type": "api_request_rejected",
+                        "reason": "invalid_item_list",
+                        "item_count": len(item),
+                        "request_id": context.aws_request_id,
+                        "source_ip": source_ip,
+                        "timestamp": timestamp,
+                    }})
+                    return {
+                        "statusCode": 400,
+                        "headers": {"Content-Type": "application/json"},
+                        "body": INVALID_LIST_BODY,
+                    }
+
+                # Multi-item payload - collapse the writes into BatchWriteItem calls
+                if sampled:
+                    xray_recorder.put_annotation("has_payload", True)
+                    xray_recorder.put_annotation("item_count", len(item))
+
+                batch_write_items(TABLE_NAME, item)
+
+                # Log successful batch data write
+                if verbose_on:
+                    logger.info("dynamodb_write_success", extra={"fields": {
+                        "event_type": "dynamodb_write_success",
+                        "table_name": TABLE_NAME,
+                        "item_count": len(item),
+                        "request_id": context.aws_request_id,
+                        "source_ip": source_ip,
+                        "timestamp": timestamp,
+                    }})
+            else:
+                ddb_item = to_item(item)
+                id = ddb_item["id"]["S"]
+
                 # Add annotation for payload processing
-                xray_recorder.put_annotation("has_payload", True)
-                xray_recorder.put_annotation("item_id", id)
-                
-                dynamodb_client.put_item(
-                    TableName=table,
-                    Item={"year": {"N": year}, "title": {"S": title}, "id": {"S": id}},
-                )
-                
+                if sampled:
+                    xray_recorder.put_annotation("has_payload", True)
+                    xray_recorder.put_annotation("item_id", id)
+
+                with xray_recorder.in_subsegment('ddb_put_item'):
+                    dynamodb_client.put_item(TableName=TABLE_NAME, Item=ddb_item)
+
                 # Log successful data write
-                logger.info(json.dumps({
-                    "event_type": "dynamodb_write_success",
-                    "table_name": table,
-                    "item_id": id,
-                    "request_id": context.aws_request_id,
-                    "source_ip": source_ip,
-                    "timestamp": datetime.utcnow().isoformat()
-                }))
-                
+                if verbose_on:
+                    logger.info("dynamodb_write_success", extra={"fields": {
+                        "event_type": "dynamodb_write_success",
+                        "table_name": TABLE_NAME,
+                        "item_id": id,
+                        "request_id": context.aws_request_id,
+                        "source_ip": source_ip,
+                        "timestamp": timestamp,
+                    }})
+
         else:
-            with xray_recorder.in_subsegment('process_request_without_payload'):
-                default_id = str(uuid.uuid4())
-                
-                # Log default processing event
-                logger.info(json.dumps({
+            default_id = secrets.token_hex(16)
+            
+            # Log default processing event
+            if verbose_on:
+                logger.info("data_processing_start", extra={"fields": {
                     "event_type": "data_processing_start",
                     "has_payload": False,
                     "default_processing": True,
                     "request_id": context.aws_request_id,
                     "source_ip": source_ip,
-                    "timestamp": datetime.utcnow().isoformat()
-                }))
-                
-                # Add annotation for default processing
+                    "timestamp": timestamp,
+                }})
+            
+            # Add annotation for default processing
+            if sampled:
                 xray_recorder.put_annotation("has_payload", False)
                 xray_recorder.put_annotation("item_id", default_id)
-                
+            
+            with xray_recorder.in_subsegment('ddb_put_item'):
                 dynamodb_client.put_item(
-                    TableName=table,
-                    Item={
-                        "year": {"N": "2012"},
-                        "title": {"S": "The Amazing Spider-Man 2"},
-                        "id": {"S": default_id},
-                    },
+                    TableName=TABLE_NAME,
+                    Item={**DEFAULT_ITEM_BASE, "id": {"S": default_id}},
                 )
-                
-                # Log successful default data write
-                logger.info(json.dumps({
+            
+            # Log successful default data write
+            if verbose_on:
+                logger.info("dynamodb_write_success", extra={"fields": {
                     "event_type": "dynamodb_write_success",
-                    "table_name": table,
+                    "table_name": TABLE_NAME,
                     "item_id": default_id,
                     "default_processing": True,
                     "request_id": context.aws_request_id,
                     "source_ip": source_ip,
-                    "timestamp": datetime.utcnow().isoformat()
-                }))
+                    "timestamp": timestamp,
+                }})
         
         # Log successful request completion
-        logger.info(json.dumps({
-            "event_type": "api_request_completed",
-            "status": "success",
-            "request_id": context.aws_request_id,
-            "source_ip": source_ip,
-            "timestamp": datetime.utcnow().isoformat()
-        }))
+        if info_on:
+            logger.info("api_request_completed", extra={"fields": {
+                "event_type": "api_request_completed",
+                "status": "success",
+                "request_id": context.aws_request_id,
+                "source_ip": source_ip,
+                "timestamp": timestamp,
+            }})
         
-        message = "Successfully inserted data!"
         return {
             "statusCode": 200,
             "headers": {"Content-Type": "application/json"},
-            "body": json.dumps({"message": message}),
+            "body": SUCCESS_BODY,
         }
         
     except Exception as e:
         # Log security-relevant error information
-        logger.error(json.dumps({
+        logger.error("api_request_error", extra={"fields": {
             "event_type": "api_request_error",
             "error_type": type(e).__name__,
             "error_message": str(e),
             "request_id": context.aws_request_id,
             "source_ip": source_ip,
-            "table_name": table,
-            "timestamp": datetime.utcnow().isoformat()
-        }))
+            "table_name": TABLE_NAME,
+            "timestamp": timestamp,
+        }})
         
         # Re-raise the exception for proper error handling
         raise
\ No newline at end of file
@@ -2,11 +2,15 @@
 # SPDX-License-Identifier: MIT-0
 
 import os
+import json
 from aws_cdk import (
     Stack,
+    CfnOutput,
+    BundlingOptions,
     aws_dynamodb as dynamodb_,
     aws_lambda as lambda_,
-    aws_apigateway as apigw_,
+    aws_apigatewayv2 as apigwv2_,
+    aws_apigatewayv2_integrations as integrations_,
     aws_ec2 as ec2,
     aws_iam as iam,
     aws_cloudwatch as cloudwatch,
@@ -18,6 +22,7 @@ from aws_cdk import (
 from constructs import Construct
 
 TABLE_NAME = "demo_table"
+FALSY_CONTEXT_VALUES = ("false", "0", "no", "off")
 
 
 class ApigwHttpApiLambdaDynamodbPythonCdkStack(Stack):
@@ -30,7 +35,7 @@ class ApigwHttpApiLambdaDynamodbPythonCdkStack(Stack):
             "CloudTrailBucket",
             encryption=s3.BucketEncryption.S3_MANAGED,
             block_public_access=s3.BlockPublicAccess.BLOCK_ALL,
-            versioning=True,
+            versioned=True,
             lifecycle_rules=[
                 s3.LifecycleRule(
                     id="CloudTrailLogRetention",
@@ -60,59 +65,76 @@ class ApigwHttpApiLambdaDynamodbPythonCdkStack(Stack):
             trail_name="security-audit-trail"
         )
 
-        # VPC
-        vpc = ec2.Vpc(
-            self,
-            "Ingress",
-            cidr="10.1.0.0/16",
-            subnet_configuration=[
-                ec2.SubnetConfiguration(
-                    name="Private-Subnet", subnet_type=ec2.SubnetType.PRIVATE_ISOLATED,
-                    cidr_mask=24
-                )
-            ],
-        )
+        # Placing the function in a VPC adds ENI setup to its cold start. It is on
+        # by default to keep DynamoDB traffic on the gateway endpoint; set the
+        # "lambda_in_vpc" context value to false to run the function outside a VPC.
+        # Context passed with "cdk synth -c" arrives as a string, so the usual
+        # falsy spellings (false, 0, no, off) are accepted too.
+        lambda_in_vpc = str(self.node.try_get_context("lambda_in_vpc")).lower() not in FALSY_CONTEXT_VALUES
+        lambda_vpc_options = {}
+
+        if lambda_in_vpc:
+            # VPC
+            vpc = ec2.Vpc(
+                self,
+                "Ingress",
+                cidr="10.1.0.0/16",
+                subnet_configuration=[
+                    ec2.SubnetConfiguration(
+                        name="Private-Subnet", subnet_type=ec2.SubnetType.PRIVATE_ISOLATED,
+                        cidr_mask=24
+                    )
+                ],
+            )
 
-        # CloudWatch Log Group for VPC Flow Logs
-        vpc_flow_log_group = logs.LogGroup(
-            self,
-            "VpcFlowLogGroup",
-            retention=logs.RetentionDays.ONE_MONTH,
-            log_group_name="/aws/vpc/flowlogs"
-        )
+            # CloudWatch Log Group for VPC Flow Logs
+            vpc_flow_log_group = logs.LogGroup(
+                self,
+                "VpcFlowLogGroup",
+                retention=logs.RetentionDays.ONE_MONTH,
+                log_group_name="/aws/vpc/flowlogs"
+            )
 
-        # Enable VPC Flow Logs
-        vpc_flow_log = ec2.FlowLog(
-            self,
-            "VpcFlowLog",
-            resource_type=ec2.FlowLogResourceType.from_vpc(vpc),
-            destination=ec2.FlowLogDestination.to_cloud_watch_logs(vpc_flow_log_group)
-        )
+            # Enable VPC Flow Logs
+            vpc_flow_log = ec2.FlowLog(
+                self,
+                "VpcFlowLog",
+                resource_type=ec2.FlowLogResourceType.from_vpc(vpc),
+                destination=ec2.FlowLogDestination.to_cloud_watch_logs(vpc_flow_log_group)
+            )
         
-        # Create VPC endpoint
-        dynamo_db_endpoint = ec2.GatewayVpcEndpoint(
-            self,
-            "DynamoDBVpce",
-            service=ec2.GatewayVpcEndpointAwsService.DYNAMODB,
-            vpc=vpc,
-        )
+            # Create VPC endpoint
+            dynamo_db_endpoint = ec2.GatewayVpcEndpoint(
+                self,
+                "DynamoDBVpce",
+                service=ec2.GatewayVpcEndpointAwsService.DYNAMODB,
+                vpc=vpc,
+            )
 
-        # This allows to customize the endpoint policy
-        dynamo_db_endpoint.add_to_policy(
-            iam.PolicyStatement(  # Restrict to listing and describing tables
-                principals=[iam.AnyPrincipal()],
-                actions=[                "dynamodb:DescribeStream",
-                "dynamodb:DescribeTable",
-                "dynamodb:Get*",
-                "dynamodb:Query",
-                "dynamodb:Scan",
-                "dynamodb:CreateTable",
-                "dynamodb:Delete*",
-                "dynamodb:Update*",
-                "dynamodb:PutItem"],
-                resources=["*"],
+            # This allows to customize the endpoint policy
+            dynamo_db_endpoint.add_to_policy(
+                iam.PolicyStatement(  # Restrict to listing and describing tables
+                    principals=[iam.AnyPrincipal()],
+                    actions=[                "dynamodb:DescribeStream",
+                    "dynamodb:DescribeTable",
+                    "dynamodb:Get*",
+                    "dynamodb:Query",
+                    "dynamodb:Scan",
+                    "dynamodb:CreateTable",
+                    "dynamodb:Delete*",
+                    "dynamodb:Update*",
+                    "dynamodb:PutItem",
+                    "dynamodb:BatchWriteItem"],
+                    resources=["*"],
+                )
             )
-        )
+
+            lambda_vpc_options = {
+                "vpc": vpc,
+                "vpc_subnets": ec2.SubnetSelection(
+                    subnet_type=ec2.SubnetType.PRIVATE_ISOLATED
+                ),
+            }
 
         # Create DynamoDb Table with audit logging
         demo_table = dynamodb_.Table(
@@ -125,45 +147,85 @@ class ApigwHttpApiLambdaDynamodbPythonCdkStack(Stack):
             stream=dynamodb_.StreamViewType.NEW_AND_OLD_IMAGES  # Enable DynamoDB Streams for audit
         )
 
-        # Add DynamoDB data events to CloudTrail
-        trail.add_event_selector(
-            read_write_type=cloudtrail.ReadWriteType.ALL,
-            include_management_events=False,
-            data_resource_type=cloudtrail.DataResourceType.DYNAMO_DB_TABLE,
-            data_resource_values=[demo_table.table_arn]
-        )
+        # Add DynamoDB data events to CloudTrail. DataResourceType has no DynamoDB
+        # member, so the selector is set on the underlying CfnTrail.
+        trail.node.default_child.add_property_override("EventSelectors", [{
+            "ReadWriteType": "All",
+            "IncludeManagementEvents": False,
+            "DataResources": [{
+                "Type": "AWS::DynamoDB::Table",
+                "Values": [demo_table.table_arn],
+            }],
+        }])
 
         # Create the Lambda function to receive the request
         api_hanlder = lambda_.Function(
             self,
             "ApiHandler",
             function_name="apigw_handler",
-            runtime=lambda_.Runtime.PYTHON_3_9,
-            code=lambda_.Code.from_asset("lambda/apigw-handler"),
-            handler="index.handler",
-            vpc=vpc,
-            vpc_subnets=ec2.SubnetSelection(
-                subnet_type=ec2.SubnetType.PRIVATE_ISOLATED
+            runtime=lambda_.Runtime.PYTHON_3_12,
+            code=lambda_.Code.from_asset(
+                "lambda/apigw-handler",
+                # With bundling, exclude only keeps these files out of the asset hash;
+                # the bundling command decides what goes into the package
+                exclude=["*.pyc", "__pycache__", ".pytest_cache", "tests", "*.md"],
+                # Install requirements.txt (aws-xray-sdk, orjson, wrapt) for the Lambda platform
+                # without dependencies, so the runtime boto3 and botocore stay a matched pair,
+                # and copy only the handler source, leaving build and test leftovers out
+                bundling=BundlingOptions(
+                    image=lambda_.Runtime.PYTHON_3_12.bundling_image,
+                    command=[
+                        "bash", "-c",
+                        "pip install --no-deps -r requirements.txt -t /asset-output && cp -au index.py /asset-output",
+                    ],
+                ),
             ),
-            memory_size=1024,
+            handler="index.handler",
+            memory_size=1769,  # 1769 MB is the smallest size with a full vCPU
             timeout=Duration.minutes(5),
             tracing=lambda_.Tracing.ACTIVE,  # Enable X-Ray tracing
+            **lambda_vpc_options,
         )
 
         # grant permission to lambda to write to demo table
         demo_table.grant_write_data(api_hanlder)
         api_hanlder.add_environment("TABLE_NAME", demo_table.table_name)
+        # Emit the per-step audit logs, set to "0" to only log request received/completed/error
+        api_hanlder.add_environment("VERBOSE_AUDIT", "1")
 
-        # Create API Gateway with X-Ray tracing enabled
-        api = apigw_.LambdaRestApi(
+        # Create API Gateway HTTP API. Tracing starts at the Lambda function,
+        # HTTP APIs do not emit X-Ray segments themselves.
+        api = apigwv2_.HttpApi(
             self,
             "Endpoint",
-            handler=api_hanlder,
-            deploy_options=apigw_.StageOptions(
-                tracing_enabled=True  # Enable X-Ray tracing
-            )
+            default_integration=integrations_.HttpLambdaIntegration(
+                "LambdaIntegration", api_hanlder
+            ),
         )
 
+        # Access logging for the default stage
+        api_access_log_group = logs.LogGroup(
+            self,
+            "ApiAccessLogGroup",
+            retention=logs.RetentionDays.ONE_MONTH,
+        )
+        default_stage = api.default_stage.node.default_child
+        default_stage.access_log_settings = apigwv2_.CfnStage.AccessLogSettingsProperty(
+            destination_arn=api_access_log_group.log_group_arn,
+            format=json.dumps({
+                "requestId": "$context.requestId",
+                "sourceIp": "$context.identity.sourceIp",
+                "userAgent": "$context.identity.userAgent",
+                "requestTime": "$context.requestTime",
+                "routeKey": "$context.routeKey",
+                "status": "$context.status",
+                "responseLatency": "$context.responseLatency",
+                "integrationLatency": "$context.integrationLatency",
+            }),
+        )
+
+        CfnOutput(self, "EndpointUrl", value=api.url)
+
         # CloudWatch Alarms for monitoring
         lambda_error_alarm = cloudwatch.Alarm(
             self,
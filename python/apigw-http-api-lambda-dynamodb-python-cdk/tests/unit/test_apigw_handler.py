@@ -0,0 +1,196 @@
+import importlib.util
+import json
+import logging
+import os
+import sys
+import types
+
+import pytest
+from aws_xray_sdk import global_sdk_config
+
+HANDLER_PATH = os.path.join(
+    os.path.dirname(__file__), "..", "..", "lambda", "apigw-handler", "index.py"
+)
+
+
+class FakeDynamoDBClient:
+    def __init__(self, batch_responses=None):
+        self.put_item_calls = []
+        self.batch_write_item_calls = []
+        self.batch_responses = list(batch_responses or [])
+
+    def put_item(self, **kwargs):
+        self.put_item_calls.append(kwargs)
+        return {}
+
+    def batch_write_item(self, **kwargs):
+        self.batch_write_item_calls.append(kwargs)
+        if self.batch_responses:
+            response = self.batch_responses.pop(0)
+            if isinstance(response, Exception):
+                raise response
+            return response
+        return {"UnprocessedItems": {}}
+
+
+@pytest.fixture
+def index(monkeypatch):
+    monkeypatch.setenv("TABLE_NAME", "demo_table")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    global_sdk_config.set_sdk_enabled(False)
+    spec = importlib.util.spec_from_file_location("apigw_handler_index", HANDLER_PATH)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    # Record the retry backoff instead of sleeping
+    module.sleeps = []
+    monkeypatch.setattr(module.time, "sleep", module.sleeps.append)
+    return module
+
+
+@pytest.fixture
+def context():
+    return types.SimpleNamespace(aws_request_id="request-id", function_name="apigw_handler")
+
+
+def make_items(count):
+    return [{"year": 2023, "title": f"title-{i}", "id": str(i)} for i in range(count)]
+
+
+def invoke(index, context, body):
+    event = {"requestContext": {"http": {"sourceIp": "203.0.113.1", "userAgent": "pytest"}}}
+    if body is not None:
+        event["body"] = json.dumps(body)
+    return index.handler(event, context)
+
+
+def test_batch_write_retries_unprocessed_items(index, monkeypatch):
+    unprocessed = {"demo_table": [index.to_put_request(make_items(1)[0])]}
+    client = FakeDynamoDBClient([{"UnprocessedItems": unprocessed}, {"UnprocessedItems": unprocessed}])
+    monkeypatch.setattr(index, "dynamodb_client", client)
+
+    index.batch_write_items("demo_table", make_items(3))
+
+    assert len(client.batch_write_item_calls) == 3
+    assert client.batch_write_item_calls[1]["RequestItems"] == unprocessed
+    assert index.sleeps == [0.1, 0.2]
+
+
+def test_batch_write_raises_after_max_retries(index, monkeypatch):
+    unprocessed = {"demo_table": [index.to_put_request(make_items(1)[0])]}
+    client = FakeDynamoDBClient([{"UnprocessedItems": unprocessed}] * (index.BATCH_WRITE_MAX_RETRIES + 1))
+    monkeypatch.setattr(index, "dynamodb_client", client)
+
+    with pytest.raises(RuntimeError):
+        index.batch_write_items("demo_table", make_items(1))
+
+    assert len(client.batch_write_item_calls) == index.BATCH_WRITE_MAX_RETRIES + 1
+    assert index.sleeps == [0.1 * 2 ** attempt for attempt in range(index.BATCH_WRITE_MAX_RETRIES)]
+
+
+def test_batch_write_slices_into_25_item_requests(index, monkeypatch):
+    client = FakeDynamoDBClient()
+    monkeypatch.setattr(index, "dynamodb_client", client)
+
+    index.batch_write_items("demo_table", make_items(60))
+
+    sizes = sorted(len(call["RequestItems"]["demo_table"]) for call in client.batch_write_item_calls)
+    assert sizes == [10, 25, 25]
+
+
+def test_handler_writes_single_item_with_put_item(index, context, monkeypatch):
+    client = FakeDynamoDBClient()
+    monkeypatch.setattr(index, "dynamodb_client", client)
+
+    response = invoke(index, context, {"year": 2023, "title": "kkkg", "id": "12"})
+
+    assert response["statusCode"] == 200
+    assert client.batch_write_item_calls == []
+    assert client.put_item_calls == [{
+        "TableName": "demo_table",
+        "Item": {"year": {"N": "2023"}, "title": {"S": "kkkg"}, "id": {"S": "12"}},
+    }]
+
+
+def test_handler_writes_list_with_batch_write_item(index, context, monkeypatch):
+    client = FakeDynamoDBClient()
+    monkeypatch.setattr(index, "dynamodb_client", client)
+
+    response = invoke(index, context, make_items(2))
+
+    assert response["statusCode"] == 200
+    assert client.put_item_calls == []
+    assert len(client.batch_write_item_calls) == 1
+    assert len(client.batch_write_item_calls[0]["RequestItems"]["demo_table"]) == 2
+
+
+def test_handler_writes_default_item_without_body(index, context, monkeypatch):
+    client = FakeDynamoDBClient()
+    monkeypatch.setattr(index, "dynamodb_client", client)
+
+    response = invoke(index, context, None)
+
+    assert response["statusCode"] == 200
+    assert client.put_item_calls[0]["Item"]["title"] == {"S": "The Amazing Spider-Man 2"}
+
+
+@pytest.mark.parametrize("body", [[], [1, 2], [{"year": 2023, "title": "kkkg", "id": "12"}, "x"]])
+def test_handler_rejects_empty_or_malformed_list(index, context, monkeypatch, body):
+    client = FakeDynamoDBClient()
+    monkeypatch.setattr(index, "dynamodb_client", client)
+
+    response = invoke(index, context, body)
+
+    assert response["statusCode"] == 400
+    assert client.batch_write_item_calls == []
+    assert client.put_item_calls == []
+
+
+def test_handler_propagates_failed_concurrent_slice(index, context, monkeypatch, caplog):
+    class FailingSliceClient(FakeDynamoDBClient):
+        def batch_write_item(self, **kwargs):
+            super().batch_write_item(**kwargs)
+            first_id = kwargs["RequestItems"]["demo_table"][0]["PutRequest"]["Item"]["id"]["S"]
+            if first_id == "25":
+                raise RuntimeError("slice failed")
+            return {"UnprocessedItems": {}}
+
+    client = FailingSliceClient()
+    monkeypatch.setattr(index, "dynamodb_client", client)
+
+    with pytest.raises(RuntimeError, match="slice failed"):
+        invoke(index, context, make_items(60))
+
+    assert len(client.batch_write_item_calls) == 3
+    errors = [getattr(record, "fields", {}) for record in caplog.records if record.levelname == "ERROR"]
+    assert len(errors) == 1
+    assert errors[0]["event_type"] == "api_request_error"
+    assert errors[0]["error_message"] == "slice failed"
+
+
+def make_record(msg, exc_info=None, sinfo=None):
+    return logging.LogRecord("test", logging.INFO, __file__, 1, msg, None, exc_info, func="handler", sinfo=sinfo)
+
+
+def test_json_fields_formatter_nests_fields_under_message(index):
+    record = make_record("api_request_received")
+    record.fields = {"event_type": "api_request_received", "source_ip": "203.0.113.1", "user_agent": 'a "quoted" agent'}
+
+    line = json.loads(index.JsonFieldsFormatter().format(record))
+
+    assert line["level"] == "INFO"
+    assert line["function"] == "handler"
+    assert line["message"] == record.fields
+    assert "exception" not in line
+
+
+def test_json_fields_formatter_keeps_exception_and_stack_info(index):
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        record = make_record("library failure", exc_info=sys.exc_info(), sinfo="Stack (most recent call last):")
+
+    line = json.loads(index.JsonFieldsFormatter().format(record))
+
+    assert line["message"] == "library failure"
+    assert "ValueError: boom" in line["exception"]
+    assert line["stack_info"] == "Stack (most recent call last):"
@@ -1,11 +1,70 @@
 import aws_cdk as core
 import aws_cdk.assertions as assertions
+import pytest
 
 from stacks.apigw_http_api_lambda_dynamodb_python_cdk_stack import ApigwHttpApiLambdaDynamodbPythonCdkStack
 
 
-def test_sqs_queue_created():
-    app = core.App()
+def synth_template(**context):
+    # Skip the Docker bundling of the Lambda asset
+    app = core.App(context={"aws:cdk:bundling-stacks": [], **context})
     stack = ApigwHttpApiLambdaDynamodbPythonCdkStack(app, "apigw-http-api-lambda-dynamodb-python-cdk")
-    template = assertions.Template.from_stack(stack)
+    return assertions.Template.from_stack(stack)
+
+
+def test_sqs_queue_created():
+    synth_template()
+
+
+def test_dynamodb_endpoint_allows_batch_write():
+    template = synth_template()
+
+    template.has_resource_properties("AWS::EC2::VPCEndpoint", {
+        "PolicyDocument": assertions.Match.object_like({
+            "Statement": assertions.Match.array_with([
+                assertions.Match.object_like({
+                    "Action": assertions.Match.array_with(["dynamodb:BatchWriteItem"]),
+                })
+            ])
+        })
+    })
+
+
+@pytest.mark.parametrize("lambda_in_vpc", [False, "false", "0", "no", "off"])
+def test_lambda_outside_vpc(lambda_in_vpc):
+    template = synth_template(lambda_in_vpc=lambda_in_vpc)
+
+    template.resource_count_is("AWS::EC2::VPC", 0)
+    template.resource_count_is("AWS::EC2::VPCEndpoint", 0)
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "FunctionName": "apigw_handler",
+        "VpcConfig": assertions.Match.absent(),
+    })
+
+
+def test_lambda_in_vpc_by_default():
+    template = synth_template()
+
+    template.resource_count_is("AWS::EC2::VPC", 1)
+    template.has_resource_properties("AWS::Lambda::Function", {
+        "FunctionName": "apigw_handler",
+        "VpcConfig": assertions.Match.object_like({
+            "SubnetIds": assertions.Match.any_value(),
+        }),
+    })
+
+
+def test_http_api_with_access_logging():
+    template = synth_template()
 
+    template.resource_count_is("AWS::ApiGateway::RestApi", 0)
+    template.has_resource_properties("AWS::ApiGatewayV2::Api", {
+        "ProtocolType": "HTTP",
+    })
+    template.has_resource_properties("AWS::ApiGatewayV2::Stage", {
+        "StageName": "$default",
+        "AccessLogSettings": assertions.Match.object_like({
+            "DestinationArn": assertions.Match.any_value(),
+            "Format": assertions.Match.any_value(),
+        }),
+    })